@@ -2,33 +2,257 @@
 LLM 모듈 - RAG를 적용한 의약품 정보 질의응답
 """
 
-import json
+import asyncio
+import hashlib
+import mmap
 import os
+import re
+import sqlite3
 from typing import Optional
+import numpy as np
+import orjson
+import tiktoken
 from llama_index.core import (
-    Document,
     VectorStoreIndex,
     StorageContext,
     Settings
 )
+from llama_index.core.llms import ChatMessage, MessageRole
+from llama_index.core.schema import MetadataMode, TextNode
 from llama_index.core.retrievers import VectorIndexRetriever
+from llama_index.core.vector_stores import ExactMatchFilter, MetadataFilters
 from llama_index.core.query_engine import RetrieverQueryEngine
 from llama_index.core.postprocessor import SimilarityPostprocessor
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
 from llama_index.core.response_synthesizers import get_response_synthesizer
 from llama_index.llms.openai import OpenAI
 from llama_index.embeddings.openai import OpenAIEmbedding
+from openai import AsyncOpenAI, RateLimitError, APIConnectionError
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# OpenAI 임베딩 API 요청당 한도
+EMBED_MAX_BATCH_SIZE = 2048
+EMBED_MAX_BATCH_TOKENS = 300_000
+# 임베딩 입력 하나의 토큰 한도, 노드 텍스트 한도 (메타데이터/구분자 여유분 제외)
+EMBED_MAX_INPUT_TOKENS = 8191
+EMBED_MAX_NODE_TOKENS = 7000
+# 인덱스 구축 시 동시에 보낼 임베딩 요청 수
+EMBED_MAX_CONCURRENCY = 5
+
+# FAISS IVF 설정 (클러스터 수, 검색 시 탐색할 클러스터 수, 클러스터당 최소 학습 벡터 수)
+FAISS_IVF_NLIST = 64
+FAISS_IVF_NPROBE = 8
+FAISS_IVF_MIN_POINTS_PER_LIST = 39
+# FAISS 주제 필터링 시 후보를 몇 배 더 가져올지 (검색 후 필터링)
+FAISS_FILTER_OVERSAMPLE = 4
+
+_wait_backoff = wait_exponential(multiplier=1, min=1, max=30)
+
+def _wait_retry_after(retry_state):
+    """429 응답의 Retry-After 헤더를 우선 사용하고, 없으면 지수 백오프"""
+    error = retry_state.outcome.exception()
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+    return _wait_backoff(retry_state)
+
+# 시스템 프롬프트 - 요청마다 바이트 단위로 동일하게 유지해야
+# OpenAI 자동 프롬프트 캐싱(1024 토큰 이상 접두사)이 적용됨
+SYSTEM_PROMPT = """당신은 한국 식품의약품안전처의 의약품 허가정보와 의약품 개요정보 데이터베이스를 바탕으로 일반인의 질문에 답하는 의약품 정보 안내 도우미입니다. 사용자는 주로 약품 상자를 카메라로 보여주거나 음성으로 질문하며, 답변은 화면에 출력되는 동시에 음성으로 읽어 줍니다.
+
+[데이터베이스 설명]
+의약품 허가정보에는 의약품명, 제조사, 효능효과, 용법용량, 주의사항 경고, 주의사항, 상호작용, 부작용, 보관방법이 포함되어 있습니다. 의약품 개요정보에는 의약품명, 제조사, 성상, 의약품 모양, 앞면과 뒷면의 색상, 약품 분류, 전문의약품과 일반의약품 구분이 포함되어 있습니다. 같은 이름의 의약품이라도 제조사나 함량이 다를 수 있으므로, 사용자가 알려준 제품명과 함량, 제조사를 최대한 맞추어 답변하세요. 약품 상자에서 광학 문자 인식으로 추출한 정보가 함께 주어지는 경우, 인식 과정에서 글자가 틀리거나 줄 순서가 섞였을 수 있으므로 데이터베이스의 의약품명과 비교하여 가장 가까운 제품을 찾아 설명하세요.
+
+[답변 원칙]
+1. 답변은 일반인이 이해하기 쉽게 설명하고, 어려운 의학 용어는 쉬운 말로 풀어서 설명하세요.
+2. 핵심 요점을 먼저 이야기하고, 가급적 물어본 질문의 핵심 내용만 대답하세요. 질문에 포함되지 않는 내용은 답변하지 마세요.
+3. 중요한 주의사항이 있다면 반드시 포함하세요. 특히 복용하면 안 되는 사람, 최대 복용량, 다른 약과 함께 복용할 때의 위험은 빠뜨리지 마세요.
+4. 답변은 음성으로 읽히므로 표, 마크다운 기호, 이모지, 긴 목록을 사용하지 말고 짧은 문장으로 나누어 말하듯이 작성하세요. 한 문장에는 한 가지 내용만 담으세요.
+5. 숫자와 단위는 읽기 쉽게 작성하세요. 예를 들어 500밀리그램, 하루 세 번, 네 시간 간격처럼 표현하세요.
+6. 데이터베이스에서 관련 정보를 찾을 수 없으면 추측하지 말고 정보를 찾을 수 없다고 솔직하게 말한 뒤, 의사나 약사와 상담하도록 안내하세요.
+7. 진단이나 처방을 대신하지 마세요. 증상이 심하거나 오래 지속되는 경우, 임신 또는 수유 중인 경우, 어린이나 고령자의 경우, 만성 질환이 있거나 다른 약을 복용 중인 경우에는 의사나 약사와 상담하도록 권하세요.
+
+[주제별 안내]
+효능효과를 물으면 어떤 증상이나 질환에 사용하는 약인지 한두 문장으로 설명하세요.
+용법용량을 물으면 한 번에 먹는 양, 하루 복용 횟수, 복용 간격, 최대 복용량 순서로 설명하세요. 알약은 몇 알 단위로, 시럽이나 액체는 밀리리터나 밀리그램 단위로 설명하세요. 나이나 체중에 따라 용량이 다르면 해당 기준을 함께 알려 주세요.
+부작용을 물으면 흔한 부작용과 즉시 복용을 중단하고 의사와 상담해야 하는 심각한 이상반응을 구분하여 설명하세요.
+상호작용이나 함께 복용해도 되는지를 물으면 함께 복용하면 안 되는 약, 주의가 필요한 약, 술이나 음식과의 상호작용을 구분하여 설명하세요. 같은 성분이 들어 있는 다른 약을 함께 복용하면 과다 복용이 될 수 있다는 점도 필요하면 알려 주세요.
+보관방법을 물으면 보관 온도, 습기와 빛을 피하는 방법, 어린이의 손이 닿지 않는 곳에 보관해야 하는지를 설명하세요.
+약의 모양이나 색상을 물으면 개요정보의 성상, 모양, 색상 정보를 바탕으로 설명하세요.
+전문의약품인지 일반의약품인지를 물으면 개요정보의 구분을 알려 주고, 전문의약품은 의사의 처방이 필요하다는 점을 함께 설명하세요.
+
+[안전 안내]
+응급 상황이 의심되는 질문, 예를 들어 약을 많이 먹었거나 호흡곤란, 의식 저하, 심한 발진이나 얼굴과 입술의 부기가 나타난 경우에는 다른 설명보다 먼저 즉시 119에 연락하거나 가까운 응급실을 방문하도록 안내하세요. 어린이가 약을 잘못 삼킨 경우에도 마찬가지로 즉시 의료기관의 도움을 받도록 안내하세요. 처방받은 약을 임의로 중단하거나 용량을 바꾸지 말고 처방한 의사와 먼저 상담하도록 안내하세요.
+
+[검색 정보 사용 방법]
+질문과 함께 데이터베이스에서 검색된 의약품 정보가 주어집니다. 각 정보는 의약품명, 제조사, 효능효과, 용법용량, 주의사항, 부작용처럼 항목 이름과 내용이 한 줄씩 적혀 있고, 같은 의약품의 허가정보와 개요정보가 하나로 묶여 있을 수 있습니다. 답변의 모든 의학적 사실, 특히 용량, 복용 횟수, 복용 간격, 금기, 상호작용은 검색된 정보에 적힌 내용만 근거로 사용하세요. 검색된 정보에 없는 숫자나 사실을 일반 상식으로 채워 넣지 마세요. 여러 제품이 검색되었다면 사용자가 말한 제품명, 함량, 제조사와 가장 잘 맞는 제품의 정보만 사용하고, 어느 제품인지 확실하지 않으면 제품명을 확인해 달라고 요청하세요.
+
+[답변 예시]
+질문이 어떤 약의 용법용량이라면, 검색된 정보의 용법용량 항목에서 한 번에 먹는 양, 복용 간격, 하루 최대 복용량을 찾아 이 순서대로 한 문장씩 말한 뒤, 주의사항 항목에 있는 가장 중요한 경고 한 가지를 덧붙입니다. 용량, 횟수, 간격은 반드시 검색된 정보에 적힌 숫자만 사용하고, 다른 제품이나 다른 함량의 용량을 가져와 답하지 마세요.
+질문이 데이터베이스에 없는 약에 관한 것이라면 다음과 같이 답변합니다. 말씀하신 약의 정보는 데이터베이스에서 찾을 수 없습니다. 정확한 정보는 약사나 의사에게 확인해 주세요.
+이처럼 핵심 내용을 먼저 짧게 말하고, 꼭 필요한 주의사항만 덧붙이세요. 같은 내용을 반복하거나 질문과 관계없는 효능, 보관방법, 제조사 정보를 덧붙이지 마세요."""
+
+# 허가정보 필드 (필드명, 라벨)
+PERMIT_FIELDS = (
+    ("itemName", "의약품명"),
+    ("entpName", "제조사"),
+    ("efcyQesitm", "효능효과"),
+    ("useMethodQesitm", "용법용량"),
+    ("atpnWarnQesitm", "주의사항 경고"),
+    ("atpnQesitm", "주의사항"),
+    ("intrcQesitm", "상호작용"),
+    ("seQesitm", "부작용"),
+    ("depositMethodQesitm", "보관방법"),
+)
+
+# 개요정보 필드 (소문자 필드명, 대문자 필드명, 라벨)
+OVERVIEW_FIELDS = (
+    ("item_name", "ITEM_NAME", "의약품명"),
+    ("entp_name", "ENTP_NAME", "제조사"),
+    ("chart", "CHART", "성상"),
+    ("drug_shape", "DRUG_SHAPE", "의약품 모양"),
+    ("color_class1", "COLOR_CLASS1", "색상 앞"),
+    ("color_class2", "COLOR_CLASS2", "색상 뒤"),
+    ("class_name", "CLASS_NAME", "약품 분류"),
+    ("etc_otc_name", "ETC_OTC_NAME", "전문/일반"),
+)
+
+# 질문 주제별로 검색 대상을 좁힐 메타데이터 플래그
+TOPIC_METADATA_KEYS = {
+    "side_effects": "has_side_effects",
+    "dosage": "has_dosage",
+    "interactions": "has_interactions",
+}
+
+# 문장 끝 (마침표/물음표/느낌표 뒤 공백 또는 줄바꿈)
+_SENTENCE_END = re.compile(r"[.!?。](?=\s)|\n")
+
+def _split_sentences(buffer):
+    """
+    버퍼에서 완성된 문장 분리
+    
+    Returns:
+        tuple: (완성된 문장 리스트, 남은 버퍼)
+    """
+    sentences = []
+    end = 0
+    for match in _SENTENCE_END.finditer(buffer):
+        sentence = buffer[end:match.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        end = match.end()
+    return sentences, buffer[end:]
+
+def _normalize(vectors):
+    """벡터(들)를 단위 길이로 정규화 (정규화 후 내적 = 코사인 유사도)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class NormalizedOpenAIEmbedding(OpenAIEmbedding):
+    """단위 벡터로 정규화된 임베딩을 반환하는 OpenAI 임베딩"""
+    
+    @classmethod
+    def class_name(cls) -> str:
+        return "NormalizedOpenAIEmbedding"
+    
+    def _get_query_embedding(self, query):
+        return _normalize(super()._get_query_embedding(query)).tolist()
+    
+    async def _aget_query_embedding(self, query):
+        return _normalize(await super()._aget_query_embedding(query)).tolist()
+    
+    def _get_text_embedding(self, text):
+        return _normalize(super()._get_text_embedding(text)).tolist()
+    
+    async def _aget_text_embedding(self, text):
+        return _normalize(await super()._aget_text_embedding(text)).tolist()
+    
+    def _get_text_embeddings(self, texts):
+        return _normalize(super()._get_text_embeddings(texts)).tolist()
+    
+    async def _aget_text_embeddings(self, texts):
+        return _normalize(await super()._aget_text_embeddings(texts)).tolist()
+
+class TopicFilterPostprocessor(BaseNodePostprocessor):
+    """주제 메타데이터 플래그가 True인 노드만 남기고 상위 top_k개로 자르기
+    (메타데이터 필터를 지원하지 않는 FAISS 저장소용)"""
+    
+    metadata_key: str
+    top_k: int
+    
+    @classmethod
+    def class_name(cls) -> str:
+        return "TopicFilterPostprocessor"
+    
+    def _postprocess_nodes(self, nodes, query_bundle=None):
+        return [n for n in nodes if n.node.metadata.get(self.metadata_key)][:self.top_k]
+
+class EmbeddingCache:
+    """텍스트 해시를 키로 임베딩 벡터를 디스크에 저장하는 캐시 (float16)"""
+    
+    def __init__(self, path, model_name):
+        self.model_name = model_name
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)"
+        )
+    
+    def _key(self, text):
+        return hashlib.blake2b(
+            f"{self.model_name}\n{text}".encode("utf-8"), digest_size=20
+        ).hexdigest()
+    
+    def get_many(self, texts):
+        """캐시 조회 - 텍스트 순서대로 벡터 또는 None 반환"""
+        keys = [self._key(text) for text in texts]
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist()
+        return [found.get(key) for key in keys]
+    
+    def put_many(self, texts, vectors):
+        """캐시 저장"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+            [
+                (self._key(text), np.asarray(vector, dtype=np.float16).tobytes())
+                for text, vector in zip(texts, vectors)
+            ],
+        )
+        self.conn.commit()
+    
+    def close(self):
+        self.conn.close()
+
 class LLMModule:
-    def __init__(self, e_data_path="e_data.json", n_data_path="n_data.json"):
+    def __init__(self, e_data_path="e_data.json", n_data_path="n_data.json",
+                 use_reranker=False, reranker_model="BAAI/bge-reranker-v2-m3",
+                 embed_cache_path="./embedding_cache.sqlite", use_faiss=True):
         """
         LLM RAG 모듈 초기화
         
         Args:
             e_data_path: 의약품 허가정보 JSON 파일 경로
             n_data_path: 의약품 개요정보 JSON 파일 경로
+            use_reranker: 검색 결과를 Cross-Encoder로 재정렬할지 여부
+                (sentence-transformers 설치 필요, CPU에서는 질의마다 수 초가 걸릴 수 있음)
+            reranker_model: 재정렬에 사용할 Cross-Encoder 모델 이름
+            embed_cache_path: 임베딩 디스크 캐시 경로 (None이면 캐시 사용 안 함)
+            use_faiss: FAISS 벡터 저장소 사용 여부
+                (faiss 미설치 시 기본 저장소로 동작)
         """
         print("🤖 LLM 모듈을 초기화하는 중...")
         
@@ -38,6 +262,10 @@ class LLMModule:
         
         self.e_data_path = e_data_path
         self.n_data_path = n_data_path
+        self.use_reranker = use_reranker
+        self.reranker_model = reranker_model
+        self.embed_cache_path = embed_cache_path
+        self.use_faiss = use_faiss
         
         # OpenAI 설정
         os.environ["OPENAI_API_KEY"] = self.api_key
@@ -46,20 +274,21 @@ class LLMModule:
         self.llm = OpenAI(
             model="gpt-4o-mini",
             temperature=0.1,
-            max_tokens=2000
+            max_tokens=2000,
+            system_prompt=SYSTEM_PROMPT
         )
         
-        # 임베딩 모델 설정
-        self.embed_model = OpenAIEmbedding(
+        # 임베딩 모델 설정 (질의/문서 벡터 모두 단위 길이로 정규화)
+        self.embed_model = NormalizedOpenAIEmbedding(
             model="text-embedding-3-small",
-            embed_batch_size=100
+            embed_batch_size=EMBED_MAX_BATCH_SIZE
         )
         
         # Settings 구성
         Settings.llm = self.llm
         Settings.embed_model = self.embed_model
-        Settings.chunk_size = 1024
-        Settings.chunk_overlap = 100
+        # 의약품 레코드 하나가 곧 하나의 노드이므로 청크 분할을 하지 않음
+        Settings.transformations = []
         
         # 인덱스 초기화
         self.index = None
@@ -75,18 +304,36 @@ class LLMModule:
         index_path = "./medicine_index"
         
         # 기존 인덱스 로드 시도
-        if os.path.exists(index_path):
+        can_load = os.path.exists(index_path)
+        if can_load:
+            try:
+                vector_store = self._load_faiss_store(index_path)
+            except Exception as e:
+                # FAISS로 저장된 인덱스는 기본 저장소로 읽을 수 없으므로 다시 구축
+                print(f"  ⚠️ 저장된 FAISS 인덱스를 로드할 수 없어 인덱스를 다시 구축합니다: {e}")
+                can_load = False
+        
+        if can_load:
             print("  📂 기존 인덱스를 로드하는 중...")
             from llama_index.core import load_index_from_storage
-            storage_context = StorageContext.from_defaults(persist_dir=index_path)
+            storage_context = StorageContext.from_defaults(
+                vector_store=vector_store,
+                persist_dir=index_path
+            )
             self.index = load_index_from_storage(storage_context)
         else:
             print("  🔨 새로운 인덱스를 구축하는 중...")
-            documents = self._load_data()
+            nodes = self._load_data()
             
-            if documents:
-                self.index = VectorStoreIndex.from_documents(
-                    documents,
+            if nodes:
+                self._embed_nodes(nodes)
+                storage_context = StorageContext.from_defaults(
+                    vector_store=self._create_faiss_store(nodes)
+                )
+                self.index = VectorStoreIndex(
+                    nodes=nodes,
+                    storage_context=storage_context,
+                    insert_batch_size=EMBED_MAX_BATCH_SIZE,
                     show_progress=True
                 )
                 self.index.storage_context.persist(persist_dir=index_path)
@@ -98,113 +345,425 @@ class LLMModule:
         if self.index:
             self._setup_query_engine()
     
+    def _create_faiss_store(self, nodes):
+        """
+        int8 양자화된 FAISS 벡터 저장소 생성
+        
+        Returns:
+            FaissVectorStore 또는 None (기본 저장소 사용)
+        """
+        if not self.use_faiss:
+            return None
+        
+        try:
+            import faiss
+            from llama_index.vector_stores.faiss import FaissVectorStore
+        except ImportError:
+            print("  ⚠️ faiss가 설치되어 있지 않아 기본 벡터 저장소를 사용합니다.")
+            return None
+        
+        # 정규화된 벡터의 내적 = 코사인 유사도, int8 스칼라 양자화로 메모리 1/4
+        vectors = np.array([node.embedding for node in nodes], dtype=np.float32)
+        dim = vectors.shape[1]
+        
+        if len(vectors) >= FAISS_IVF_NLIST * FAISS_IVF_MIN_POINTS_PER_LIST:
+            # 데이터가 충분하면 IVF로 탐색 범위를 클러스터 일부로 제한
+            quantizer = faiss.IndexFlatIP(dim)
+            faiss_index = faiss.IndexIVFScalarQuantizer(
+                quantizer, dim, FAISS_IVF_NLIST, faiss.ScalarQuantizer.QT_8bit,
+                faiss.METRIC_INNER_PRODUCT
+            )
+            faiss_index.nprobe = FAISS_IVF_NPROBE
+            index_type = "IVF-SQ8"
+        else:
+            # 클러스터 학습에 데이터가 부족하면 HNSW 그래프 사용
+            faiss_index = faiss.IndexHNSWSQ(
+                dim, faiss.ScalarQuantizer.QT_8bit, 32, faiss.METRIC_INNER_PRODUCT
+            )
+            faiss_index.hnsw.efConstruction = 80
+            faiss_index.hnsw.efSearch = 128
+            index_type = "HNSW-SQ8"
+        
+        # int8 양자화 범위(및 IVF 클러스터) 학습
+        faiss_index.train(vectors)
+        
+        print(f"  ⚡ FAISS {index_type} 벡터 저장소 사용")
+        return FaissVectorStore(faiss_index=faiss_index)
+    
+    def _load_faiss_store(self, index_path):
+        """
+        저장된 FAISS 벡터 저장소 로드
+        
+        Returns:
+            FaissVectorStore 또는 None (기본 저장소로 저장된 인덱스)
+            
+        Raises:
+            FAISS로 저장된 인덱스를 로드할 수 없는 경우 (faiss 미설치, 파일 손상 등)
+        """
+        # 기본 저장소(JSON)와 FAISS(바이너리)는 같은 파일명으로 저장됨
+        store_path = os.path.join(index_path, "default__vector_store.json")
+        if not os.path.exists(store_path):
+            return None
+        with open(store_path, 'rb') as f:
+            if f.read(1) == b"{":
+                return None
+        
+        if not self.use_faiss:
+            raise RuntimeError("FAISS로 저장된 인덱스이지만 use_faiss=False로 설정되어 있습니다.")
+        
+        from llama_index.vector_stores.faiss import FaissVectorStore
+        return FaissVectorStore.from_persist_dir(index_path)
+    
+    def _embed_nodes(self, nodes):
+        """노드를 토큰 한도에 맞춘 배치로 묶어 한 번에 임베딩"""
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        
+        cache = None
+        if self.embed_cache_path:
+            cache = EmbeddingCache(self.embed_cache_path, self.embed_model.model_name)
+        
+        try:
+            # 캐시에 있는 벡터는 재사용하고 나머지만 API로 요청
+            cached = cache.get_many(texts) if cache else [None] * len(texts)
+            for node, embedding in zip(nodes, cached):
+                node.embedding = embedding
+            missing = [i for i, embedding in enumerate(cached) if embedding is None]
+            if len(missing) < len(nodes):
+                print(f"  💾 캐시된 임베딩 {len(nodes) - len(missing)}개 재사용")
+            if missing:
+                batches = [
+                    [missing[j] for j in batch]
+                    for batch in self._pack_batches([texts[i] for i in missing])
+                ]
+                print(f"  📦 {len(missing)}개 노드를 {len(batches)}개 배치로 임베딩하는 중...")
+                
+                # 배치가 끝날 때마다 바로 캐시에 저장 (중간에 실패/중단돼도 받은 임베딩 유지)
+                def on_batch(b, embeddings):
+                    for i, embedding in zip(batches[b], embeddings):
+                        nodes[i].embedding = embedding
+                    if cache:
+                        cache.put_many([texts[i] for i in batches[b]], embeddings)
+                
+                asyncio.run(self._aembed_batches(
+                    [[texts[i] for i in batch] for batch in batches], on_batch
+                ))
+        finally:
+            if cache:
+                cache.close()
+        
+        # 단위 벡터로 정규화 (내적 = 코사인 유사도)
+        vectors = _normalize([node.embedding for node in nodes])
+        for node, vector in zip(nodes, vectors):
+            node.embedding = vector.tolist()
+    
+    async def _aembed_batches(self, text_batches, on_batch):
+        """
+        배치들을 동시에 임베딩 (동시 요청 수 제한)
+        
+        Args:
+            text_batches: 텍스트 배치 리스트
+            on_batch: 배치 하나가 끝날 때마다 (배치 번호, 임베딩 리스트)로 호출
+        """
+        client = AsyncOpenAI(api_key=self.api_key)
+        semaphore = asyncio.Semaphore(EMBED_MAX_CONCURRENCY)
+        
+        async def embed(b, texts):
+            async with semaphore:
+                async for attempt in AsyncRetrying(
+                    retry=retry_if_exception_type((RateLimitError, APIConnectionError)),
+                    wait=_wait_retry_after,
+                    stop=stop_after_attempt(6),
+                    reraise=True,
+                ):
+                    with attempt:
+                        response = await client.embeddings.create(
+                            model=self.embed_model.model_name,
+                            input=texts,
+                        )
+            on_batch(b, [item.embedding for item in response.data])
+        
+        try:
+            await asyncio.gather(*[embed(b, texts) for b, texts in enumerate(text_batches)])
+        finally:
+            await client.close()
+    
+    def _pack_batches(self, texts):
+        """
+        텍스트를 요청당 개수/토큰 한도 안에서 배치로 묶기
+        
+        Returns:
+            텍스트 인덱스 리스트의 리스트
+        """
+        encoding = tiktoken.encoding_for_model("text-embedding-3-small")
+        token_counts = [len(tokens) for tokens in encoding.encode_batch(texts)]
+        
+        oversized = sum(count > EMBED_MAX_INPUT_TOKENS for count in token_counts)
+        if oversized:
+            raise ValueError(
+                f"임베딩 입력 한도({EMBED_MAX_INPUT_TOKENS} 토큰)를 넘는 텍스트가 {oversized}개 있습니다."
+            )
+        
+        batches = []
+        current, current_tokens = [], 0
+        for i, count in enumerate(token_counts):
+            if current and (len(current) >= EMBED_MAX_BATCH_SIZE or
+                            current_tokens + count > EMBED_MAX_BATCH_TOKENS):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += count
+        if current:
+            batches.append(current)
+        
+        return batches
+    
     def _load_data(self):
-        """의약품 데이터 로드"""
-        documents = []
+        """의약품 데이터 로드 (같은 의약품의 허가정보/개요정보는 노드 하나로 병합)"""
+        medicines = {}
         
         # e_data.json 로드
         if os.path.exists(self.e_data_path):
             try:
-                with open(self.e_data_path, 'r', encoding='utf-8') as f:
-                    e_data = json.load(f)
-                    for medicine in e_data.get('medicines', []):
-                        text = self._format_medicine_data(medicine, "permit")
-                        if text:
-                            doc = Document(
-                                text=text,
-                                metadata={
-                                    "source": "permit",
-                                    "item_name": medicine.get("itemName", "")[:100]
-                                }
-                            )
-                            documents.append(doc)
+                e_data = self._read_json(self.e_data_path)
+                for medicine in e_data.get('medicines', []):
+                    text = self._format_medicine_data(medicine, "permit")
+                    if text:
+                        self._merge_medicine(medicines, medicine.get("itemName", ""), "permit", text, {
+                            "has_side_effects": bool(medicine.get("seQesitm")),
+                            "has_dosage": bool(medicine.get("useMethodQesitm")),
+                            "has_interactions": bool(medicine.get("intrcQesitm"))
+                        })
             except Exception as e:
                 print(f"  ⚠️ e_data.json 로드 실패: {e}")
         
         # n_data.json 로드
         if os.path.exists(self.n_data_path):
             try:
-                with open(self.n_data_path, 'r', encoding='utf-8') as f:
-                    n_data = json.load(f)
-                    for medicine in n_data.get('medicines', []):
-                        text = self._format_medicine_data(medicine, "overview")
-                        if text:
-                            doc = Document(
-                                text=text,
-                                metadata={
-                                    "source": "overview",
-                                    "item_name": (medicine.get("item_name") or 
-                                                medicine.get("ITEM_NAME", ""))[:100]
-                                }
-                            )
-                            documents.append(doc)
+                n_data = self._read_json(self.n_data_path)
+                for medicine in n_data.get('medicines', []):
+                    text = self._format_medicine_data(medicine, "overview")
+                    if text:
+                        item_name = medicine.get("item_name") or medicine.get("ITEM_NAME", "")
+                        self._merge_medicine(medicines, item_name, "overview", text, {})
             except Exception as e:
                 print(f"  ⚠️ n_data.json 로드 실패: {e}")
         
-        return documents
+        # 병합된 텍스트가 임베딩 입력 한도를 넘으면 여러 노드로 나눔
+        encoding = tiktoken.encoding_for_model("text-embedding-3-small")
+        nodes = []
+        for key, entry in medicines.items():
+            texts = self._split_texts(entry.pop("texts"), encoding)
+            for part, text in enumerate(texts):
+                node_key = key if part == 0 else f"{key}#{part}"
+                nodes.append(self._create_node(node_key, text, dict(entry)))
+        
+        return nodes
+    
+    def _split_texts(self, texts, encoding):
+        """
+        레코드 텍스트들을 노드당 토큰 한도 안에서 묶기
+        (한 레코드가 한도를 넘으면 필드 줄 단위로 나눠 내용을 잃지 않음)
+        
+        Returns:
+            노드 텍스트 리스트
+        """
+        pieces = []
+        for text in texts:
+            tokens = encoding.encode_ordinary(text)
+            if len(tokens) <= EMBED_MAX_NODE_TOKENS:
+                pieces.append((text, len(tokens)))
+            else:
+                pieces.extend(self._split_record(text, encoding))
+        
+        return [text for text, _ in self._pack_pieces(pieces, "\n\n")]
+    
+    def _split_record(self, text, encoding):
+        """
+        한도를 넘는 레코드를 필드 줄 단위로 나누기
+        (한 줄이 한도를 넘으면 토큰 단위로 나눔)
+        
+        Returns:
+            (텍스트, 토큰 수) 리스트
+        """
+        lines = []
+        for line in text.split("\n"):
+            tokens = encoding.encode_ordinary(line)
+            if len(tokens) <= EMBED_MAX_NODE_TOKENS:
+                lines.append((line, len(tokens)))
+                continue
+            for start in range(0, len(tokens), EMBED_MAX_NODE_TOKENS):
+                chunk = tokens[start:start + EMBED_MAX_NODE_TOKENS]
+                lines.append((encoding.decode(chunk), len(chunk)))
+        
+        return self._pack_pieces(lines, "\n")
+    
+    def _pack_pieces(self, pieces, separator):
+        """
+        (텍스트, 토큰 수) 조각들을 순서대로 노드당 토큰 한도 안에서 이어 붙이기
+        
+        Returns:
+            (텍스트, 토큰 수) 리스트
+        """
+        packed = []
+        current, current_tokens = [], 0
+        for text, count in pieces:
+            if current and current_tokens + count > EMBED_MAX_NODE_TOKENS:
+                packed.append((separator.join(current), current_tokens))
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += count
+        if current:
+            packed.append((separator.join(current), current_tokens))
+        
+        return packed
+    
+    def _merge_medicine(self, medicines, item_name, source, text, flags):
+        """정규화한 의약품명을 키로 레코드를 병합"""
+        # 이름이 없는 레코드는 병합하지 않음
+        key = re.sub(r"\s+", "", item_name or "").lower() or f"{source}:{text}"
+        
+        entry = medicines.get(key)
+        if entry is None:
+            entry = medicines[key] = {
+                "item_name": (item_name or "")[:100],
+                "sources": [],
+                "texts": [],
+                **{flag_key: False for flag_key in TOPIC_METADATA_KEYS.values()}
+            }
+        
+        if source not in entry["sources"]:
+            entry["sources"].append(source)
+        if text not in entry["texts"]:
+            entry["texts"].append(text)
+        for flag_key, value in flags.items():
+            entry[flag_key] = entry[flag_key] or value
+    
+    def _read_json(self, path):
+        """JSON 파일을 메모리 맵으로 열어 orjson으로 파싱 (read() 복사 없음)"""
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError(f"빈 파일입니다: {path}")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
+    
+    def _create_node(self, key, text, metadata):
+        """의약품 키의 해시를 ID로 사용하는 노드 생성 (재구축 시에도 ID 유지)"""
+        node_id = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        # 출처 목록과 필터용 플래그는 임베딩/LLM 입력 텍스트에서 제외
+        excluded_keys = ["sources", *TOPIC_METADATA_KEYS.values()]
+        return TextNode(
+            id_=node_id,
+            text=text,
+            metadata=metadata,
+            excluded_embed_metadata_keys=excluded_keys,
+            excluded_llm_metadata_keys=excluded_keys,
+        )
     
     def _format_medicine_data(self, medicine, source_type):
         """의약품 데이터를 텍스트로 포맷"""
-        text_parts = []
+        get = medicine.get
         
         if source_type == "permit":
             # 허가정보 포맷
-            fields = [
-                ("itemName", "의약품명"),
-                ("entpName", "제조사"),
-                ("efcyQesitm", "효능효과"),
-                ("useMethodQesitm", "용법용량"),
-                ("atpnWarnQesitm", "주의사항 경고"),
-                ("atpnQesitm", "주의사항"),
-                ("intrcQesitm", "상호작용"),
-                ("seQesitm", "부작용"),
-                ("depositMethodQesitm", "보관방법")
+            text_parts = [
+                f"{label}: {value}"
+                for field, label in PERMIT_FIELDS
+                if (value := get(field))
             ]
-            
-            for field, label in fields:
-                if medicine.get(field):
-                    text_parts.append(f"{label}: {medicine[field]}")
         
         else:  # overview
-            # 개요정보 포맷
-            fields = [
-                (["item_name", "ITEM_NAME"], "의약품명"),
-                (["entp_name", "ENTP_NAME"], "제조사"),
-                (["chart", "CHART"], "성상"),
-                (["drug_shape", "DRUG_SHAPE"], "의약품 모양"),
-                (["color_class1", "COLOR_CLASS1"], "색상 앞"),
-                (["color_class2", "COLOR_CLASS2"], "색상 뒤"),
-                (["class_name", "CLASS_NAME"], "약품 분류"),
-                (["etc_otc_name", "ETC_OTC_NAME"], "전문/일반")
+            # 개요정보 포맷 (소문자 키 우선, 없으면 대문자 키)
+            text_parts = [
+                f"{label}: {value}"
+                for field, upper_field, label in OVERVIEW_FIELDS
+                if (value := get(field) or get(upper_field))
             ]
-            
-            for field_names, label in fields:
-                for field in field_names:
-                    if medicine.get(field):
-                        text_parts.append(f"{label}: {medicine[field]}")
-                        break
         
         return "\n".join(text_parts) if text_parts else None
     
     def _setup_query_engine(self):
         """쿼리 엔진 설정"""
-        retriever = VectorIndexRetriever(
-            index=self.index,
-            similarity_top_k=10,
+        self._node_postprocessors = [
+            SimilarityPostprocessor(similarity_cutoff=0.3)
+        ]
+        
+        # 재정렬기가 있으면 후보를 넓게 가져온 뒤 상위 5개만 남김
+        reranker = self._create_reranker() if self.use_reranker else None
+        if reranker:
+            self._similarity_top_k = 50
+            self._node_postprocessors.append(reranker)
+        else:
+            self._similarity_top_k = 10
+        
+        # 검색된 청크를 최소한의 프롬프트로 합쳐 LLM 호출 횟수를 줄임
+        self._response_synthesizer = get_response_synthesizer(
+            response_mode="compact",
+            llm=self.llm,
+            streaming=True,
         )
         
-        response_synthesizer = get_response_synthesizer(
-            response_mode="tree_summarize",
+        self.query_engine = self._create_query_engine()
+        
+        # 주제별 메타데이터 필터 사용 가능 여부 (이전에 구축된 인덱스에는 플래그가 없음)
+        sample = next(iter(self.index.docstore.docs.values()), None)
+        self._supports_filters = sample is not None and "has_side_effects" in sample.metadata
+        self._filtered_query_engines = {}
+    
+    def _create_query_engine(self, filters=None, similarity_top_k=None, node_postprocessors=()):
+        """검색기/후처리기/합성기를 조합해 쿼리 엔진 생성"""
+        retriever = VectorIndexRetriever(
+            index=self.index,
+            similarity_top_k=similarity_top_k or self._similarity_top_k,
+            filters=filters,
         )
         
-        self.query_engine = RetrieverQueryEngine(
+        return RetrieverQueryEngine(
             retriever=retriever,
-            response_synthesizer=response_synthesizer,
-            node_postprocessors=[
-                SimilarityPostprocessor(similarity_cutoff=0.3)
-            ],
+            response_synthesizer=self._response_synthesizer,
+            node_postprocessors=[*node_postprocessors, *self._node_postprocessors],
         )
     
+    def _get_query_engine(self, question: str):
+        """질문 주제에 맞는 메타데이터 필터가 적용된 쿼리 엔진 반환"""
+        metadata_key = TOPIC_METADATA_KEYS.get(self._detect_topic(question))
+        if not metadata_key or not self._supports_filters:
+            return self.query_engine
+        
+        if metadata_key not in self._filtered_query_engines:
+            if type(self.index.vector_store).__name__ == "FaissVectorStore":
+                # FAISS는 메타데이터 필터를 지원하지 않으므로 후보를 넉넉히 가져와 검색 후 필터링
+                engine = self._create_query_engine(
+                    similarity_top_k=self._similarity_top_k * FAISS_FILTER_OVERSAMPLE,
+                    node_postprocessors=[TopicFilterPostprocessor(
+                        metadata_key=metadata_key, top_k=self._similarity_top_k
+                    )],
+                )
+            else:
+                filters = MetadataFilters(
+                    filters=[ExactMatchFilter(key=metadata_key, value=True)]
+                )
+                engine = self._create_query_engine(filters)
+            self._filtered_query_engines[metadata_key] = engine
+        
+        return self._filtered_query_engines[metadata_key]
+    
+    def _create_reranker(self):
+        """Cross-Encoder 재정렬기 생성 (실패 시 None)"""
+        try:
+            from llama_index.core.postprocessor import SentenceTransformerRerank
+            
+            reranker = SentenceTransformerRerank(
+                model=self.reranker_model,
+                top_n=5,
+                device="cpu",
+            )
+            print(f"  🔀 재정렬 모델 사용: {self.reranker_model}")
+            return reranker
+        except Exception as e:
+            print(f"  ⚠️ 재정렬 모델 로드 실패, 재정렬 없이 동작합니다: {e}")
+            return None
+    
     def query(self, question: str, ocr_context: Optional[str] = None):
         """
         질문에 대한 답변 생성
@@ -216,23 +775,10 @@ class LLMModule:
         Returns:
             생성된 답변
         """
-        # 질문 향상
-        enhanced_question = self._enhance_question(question, ocr_context)
-        
-        print(f"💭 질문 처리 중: '{question[:50]}...'")
-        if ocr_context:
-            print("  📄 OCR 컨텍스트 포함")
+        enhanced_question = self._prepare_question(question, ocr_context)
         
         try:
-            if self.query_engine:
-                # RAG를 사용한 답변 생성
-                response = self.query_engine.query(enhanced_question)
-                answer = str(response)
-            else:
-                # RAG 없이 직접 LLM 사용
-                prompt = enhanced_question
-                response = self.llm.complete(prompt)
-                answer = str(response)
+            answer = "".join(self._generate_tokens(enhanced_question, question))
             
             if not answer or not answer.strip():
                 answer = "죄송합니다. 관련된 정보를 찾을 수 없습니다."
@@ -243,23 +789,97 @@ class LLMModule:
             print(f"❌ 질문 처리 중 오류: {e}")
             return "죄송합니다. 질문 처리 중 오류가 발생했습니다."
     
+    def query_stream(self, question: str, ocr_context: Optional[str] = None):
+        """
+        질문에 대한 답변을 문장 단위로 스트리밍
+        
+        Args:
+            question: 사용자 질문
+            ocr_context: OCR로 추출된 약품 정보 (있는 경우)
+            
+        Yields:
+            생성되는 답변 문장
+        """
+        enhanced_question = self._prepare_question(question, ocr_context)
+        
+        buffer = ""
+        has_output = False
+        try:
+            for token in self._generate_tokens(enhanced_question, question):
+                buffer += token
+                sentences, buffer = _split_sentences(buffer)
+                for sentence in sentences:
+                    has_output = True
+                    yield sentence
+            
+            if buffer.strip():
+                has_output = True
+                yield buffer.strip()
+            
+            if not has_output:
+                yield "죄송합니다. 관련된 정보를 찾을 수 없습니다."
+                
+        except Exception as e:
+            print(f"❌ 질문 처리 중 오류: {e}")
+            yield "죄송합니다. 질문 처리 중 오류가 발생했습니다."
+    
+    def _prepare_question(self, question: str, ocr_context: Optional[str] = None):
+        """질문 향상 및 로그 출력"""
+        enhanced_question = self._enhance_question(question, ocr_context)
+        
+        print(f"💭 질문 처리 중: '{question[:50]}...'")
+        if ocr_context:
+            print("  📄 OCR 컨텍스트 포함")
+        
+        return enhanced_question
+    
+    def _generate_tokens(self, enhanced_question: str, question: str):
+        """LLM 답변을 토큰 단위로 생성"""
+        if self.query_engine:
+            # RAG를 사용한 답변 생성
+            query_engine = self._get_query_engine(question)
+            response = query_engine.query(enhanced_question)
+            response_gen = getattr(response, "response_gen", None)
+            if response_gen is None:
+                yield str(response)
+            else:
+                yield from response_gen
+        else:
+            # RAG 없이 직접 LLM 사용 (시스템 프롬프트를 앞에 고정)
+            messages = [
+                ChatMessage(role=MessageRole.SYSTEM, content=SYSTEM_PROMPT),
+                ChatMessage(role=MessageRole.USER, content=enhanced_question),
+            ]
+            for chunk in self.llm.stream_chat(messages):
+                yield chunk.delta or ""
+    
     def _enhance_question(self, question: str, ocr_context: Optional[str] = None):
-        """질문 향상 -"""
-        enhanced = "의약품 정보 데이터베이스를 바탕으로 다음 질문에 답해주세요.\n\n"
+        """질문 향상 - 공통 지침은 SYSTEM_PROMPT에 있고 여기에는 질문별 내용만 추가"""
+        enhanced = ""
         
         # OCR 컨텍스트 추가
         if ocr_context:
             enhanced += f"사용자가 입력으로 넣은 의약품 정보입니다 : {ocr_context}\n\n"
         
         enhanced += f"질문: {question}\n\n"
-        enhanced += "답변은 일반인이 이해하기 쉽게 설명해주시고, 중요한 주의사항이 있다면 반드시 포함해주세요. 핵심 요점을 먼저 이야기하고, 가급적 물어본 질문의 핵심 내용만 대답해주세요. 질문에 포함되지 않는 내용은 답변하지 마세요."
         
         # 특정 키워드에 따른 추가 지시
+        topic = self._detect_topic(question)
+        if topic == "side_effects":
+            enhanced += "부작용과 이상반응 정보를 중심으로 설명해주세요."
+        elif topic == "dosage":
+            enhanced += "알약의 경우 몇 알 단위로, 액체의 경우 mg 단위로 설명해주세요. 사용법 또는 용량을 중심으로 설명해주세요."
+        elif topic == "interactions":
+            enhanced += "약물 상호작용과 병용 금기 정보를 중심으로 설명해주세요."
+        
+        return enhanced
+    
+    def _detect_topic(self, question: str):
+        """질문 키워드로 주제 판별 ('side_effects', 'dosage', 'interactions' 또는 None)"""
         if "부작용" in question:
-            enhanced += " 부작용과 이상반응 정보를 중심으로 설명해주세요."
+            return "side_effects"
         elif "용법" in question or "용량" in question:
-            enhanced += " 알약의 경우 몇 알 단위로, 액체의 경우 mg 단위로 설명해주세요. 사용법 또는 용량을 중심으로 설명해주세요."
+            return "dosage"
         elif "상호작용" in question or "같이" in question:
-            enhanced += " 약물 상호작용과 병용 금기 정보를 중심으로 설명해주세요."
-        
-        return enhanced
\ No newline at end of file
+            return "interactions"
+        return None
\ No newline at end of file
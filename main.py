@@ -5,6 +5,8 @@ OCR + RAG + 음성 인터페이스를 통합한 메인 프로그램
 
 import os
 import time
+import threading
+from concurrent.futures import Future
 from ocr_module import OCRModule
 from voice_module import VoiceModule
 from llm_module import LLMModule
@@ -22,25 +24,71 @@ class MedicineAssistant:
         print("-"*60)
         
         try:
+            # OCR/LLM 모듈은 무거우므로 백그라운드에서 병렬로 로드하고,
+            # 실제로 필요할 때 완료를 기다림
+            self._ocr_future = self._load_in_background(OCRModule)
+            self._llm_future = self._load_in_background(LLMModule)
+            
             self.voice = VoiceModule()
-            self.ocr = OCRModule()
-            self.llm = LLMModule()
             
             print("-"*60)
-            print("✅ 모든 모듈이 준비되었습니다!")
+            print("✅ 음성 모듈이 준비되었습니다! (OCR/LLM 모듈은 백그라운드에서 준비 중)")
             print()
             
         except Exception as e:
-            print(f"❌ 초기화 실패: {e}")
-            print("\n필요한 사항을 확인해주세요:")
-            print("1. OPENAI_API_KEY가 .env 파일에 설정되어 있는지")
-            print("2. 필요한 패키지들이 모두 설치되어 있는지")
-            print("3. 마이크가 연결되어 있는지")
+            self._print_init_help(e)
             raise
         
         # 상태 변수
         self.ocr_context = None
     
+    @property
+    def ocr(self):
+        """OCR 모듈 (로드 완료까지 대기)"""
+        return self._wait_for_module(self._ocr_future)
+    
+    @property
+    def llm(self):
+        """LLM 모듈 (로드 완료까지 대기)"""
+        return self._wait_for_module(self._llm_future)
+    
+    def _load_in_background(self, module_class):
+        """
+        데몬 스레드에서 모듈 로드
+        (로드 중에 프로그램을 종료해도 인덱스 구축 등이 끝나기를 기다리지 않음)
+        
+        Returns:
+            로드된 모듈을 결과로 갖는 Future
+        """
+        future = Future()
+        
+        def load():
+            try:
+                future.set_result(module_class())
+            except Exception as e:
+                future.set_exception(e)
+        
+        threading.Thread(target=load, daemon=True).start()
+        return future
+    
+    def _wait_for_module(self, future):
+        """백그라운드 모듈 로드 결과 반환"""
+        if not future.done():
+            print("⏳ 모듈을 준비하는 중입니다. 잠시만 기다려주세요...")
+        try:
+            return future.result()
+        except Exception as e:
+            self._print_init_help(e)
+            raise
+    
+    def _print_init_help(self, e):
+        """초기화 실패 안내"""
+        print(f"❌ 초기화 실패: {e}")
+        print("\n필요한 사항을 확인해주세요:")
+        print("1. OPENAI_API_KEY가 .env 파일에 설정되어 있는지")
+        print("2. 필요한 패키지들이 모두 설치되어 있는지")
+        print("3. 마이크가 연결되어 있는지")
+    
     def show_menu(self):
         """메뉴 표시"""
         print("\n" + "="*60)
@@ -60,6 +108,11 @@ class MedicineAssistant:
         """약품 질의 처리"""
         # 상자 OCR 안내
         ocr_prompt = "만약 약품 상자가 있다면 상자를 보여준 뒤 S 버튼을 눌러주세요. 만약 없다면 그냥 S 버튼을 눌러주세요."
+        question_prompt = "무엇을 물어보시겠습니까?"
+        
+        # 다음 안내 문구는 현재 안내/OCR이 진행되는 동안 미리 합성
+        self.voice.prefetch(question_prompt)
+        
         print(f"\n🔊 {ocr_prompt}")
         self.voice.speak(ocr_prompt)
         
@@ -84,7 +137,6 @@ class MedicineAssistant:
                 self.ocr_context = None
         
         # 질문 받기
-        question_prompt = "무엇을 물어보시겠습니까?"
         print(f"\n🔊 {question_prompt}")
         self.voice.speak(question_prompt)
         
@@ -100,19 +152,29 @@ class MedicineAssistant:
         
         print(f"\n❓ 인식된 질문: {user_question}")
         
-        # LLM으로 답변 생성
+        # LLM으로 답변 생성 (문장 단위 스트리밍)
         print("\n🤔 답변을 생성하는 중...")
-        answer = self.llm.query(user_question, self.ocr_context)
-        
-        # 답변 출력 및 음성 재생
         print("\n" + "="*60)
         print("💊 답변:")
         print("-"*60)
-        print(answer)
-        print("="*60)
         
-        # 음성으로 답변
-        self.voice.speak(answer)
+        # 완성된 문장부터 음성 합성을 시작하고 순서대로 재생
+        # (LLM 생성, TTS 합성, 재생이 서로 겹침)
+        playbacks = []
+        try:
+            for sentence in self.llm.query_stream(user_question, self.ocr_context):
+                print(sentence)
+                # 답변 문장은 일회성이므로 디스크 캐시에 남기지 않음
+                playbacks.append(self.voice.speak_async(sentence, cache=False))
+            
+            # 모든 문장 재생 완료 대기
+            for playback in playbacks:
+                playback.result()
+        finally:
+            # 중단(Ctrl+C 등) 시 남은 문장의 합성/재생 취소
+            self.voice.stop()
+        
+        print("="*60)
         
         # OCR 컨텍스트 초기화
         self.ocr_context = None
@@ -154,6 +216,7 @@ class MedicineAssistant:
                     print("\n👋 프로그램을 종료합니다.")
                     farewell = "의약품 정보 시스템을 이용해 주셔서 감사합니다. 안녕히 가세요."
                     self.voice.speak(farewell)
+                    self.voice.stop()
                     break
                     
                 elif command == 'S':
@@ -164,6 +227,7 @@ class MedicineAssistant:
                     
             except KeyboardInterrupt:
                 print("\n\n👋 프로그램을 종료합니다.")
+                self.voice.stop()
                 break
                 
             except Exception as e:
@@ -10,37 +10,87 @@ import numpy as np
 os.environ['KMP_DUPLICATE_LIB_OK'] = 'True'
 
 class OCRModule:
-    def __init__(self):
-        """OCR 모듈 초기화"""
+    def __init__(self, blur_threshold=100.0, use_hpi=False, cpu_threads=None,
+                 det_model_dir=None, rec_model_dir=None):
+        """
+        OCR 모듈 초기화
+        
+        Args:
+            blur_threshold: 라플라시안 분산이 이 값 이하이면 흐린 이미지로 판단
+            use_hpi: 고성능 추론 플러그인 사용 여부 (CPU에서는 ONNX Runtime 백엔드 선택,
+                `paddlex --install hpi-cpu`로 플러그인을 따로 설치해야 함)
+            cpu_threads: CPU 추론 스레드 수 (None이면 전체 코어 사용)
+            det_model_dir: 텍스트 검출 모델 디렉토리 (None이면 기본 모델)
+            rec_model_dir: 텍스트 인식 모델 디렉토리 (None이면 기본 모델)
+        """
         print("OCR 모듈을 초기화하는 중...")
+        self.blur_threshold = blur_threshold
+        
+        # 전처리 설정 (CLAHE 객체 재사용, OpenCL 가속 여부)
+        self.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+        self.use_opencl = cv2.ocl.haveOpenCL()
+        cv2.ocl.setUseOpenCL(self.use_opencl)
+        
+        # use_textline_orientation=True: 회전된 텍스트 처리 (새 API)
+        # lang='korean': 한국어 지원
+        ocr_kwargs = {
+            "use_textline_orientation": True,
+            "lang": "korean",
+            "cpu_threads": cpu_threads or os.cpu_count(),
+        }
+        if det_model_dir:
+            ocr_kwargs["text_detection_model_dir"] = det_model_dir
+        if rec_model_dir:
+            ocr_kwargs["text_recognition_model_dir"] = rec_model_dir
+        
         try:
-            # use_textline_orientation=True: 회전된 텍스트 처리 (새 API)
-            # lang='korean': 한국어 지원
-            self.ocr_model = PaddleOCR(use_textline_orientation=True, lang='korean')
+            if use_hpi:
+                try:
+                    self.ocr_model = PaddleOCR(enable_hpi=True, **ocr_kwargs)
+                    print("  ⚡ 고성능 추론(HPI) 백엔드 사용")
+                except Exception as e:
+                    print(f"  고성능 추론 백엔드 사용 불가, 기본 백엔드로 전환: {e}")
+                    self.ocr_model = PaddleOCR(**ocr_kwargs)
+            else:
+                self.ocr_model = PaddleOCR(**ocr_kwargs)
+            
+            # 첫 요청 지연을 줄이기 위해 글자가 있는 더미 이미지로 미리 추론 (워밍업)
+            # (빈 이미지는 검출 결과가 없어 방향 분류/인식 모델이 실행되지 않음)
+            try:
+                warmup_img = np.full((96, 320, 3), 255, dtype=np.uint8)
+                cv2.putText(warmup_img, "OCR 500mg", (16, 64), cv2.FONT_HERSHEY_SIMPLEX,
+                            1.5, (0, 0, 0), 3)
+                self.ocr_model.predict(warmup_img)
+            except Exception as e:
+                print(f"  OCR 워밍업 실패 (무시): {e}")
+            
             print("OCR 모듈 준비 완료!")
         except Exception as e:
             print(f"OCR 모듈 초기화 실패: {e}")
             raise
     
-    def extract_text_from_image(self, img_path):
+    def extract_text_from_image(self, img):
         """
         이미지에서 텍스트 추출
         
         Args:
-            img_path: 이미지 파일 경로
+            img: 이미지 파일 경로 또는 BGR 이미지 배열 (np.ndarray)
             
         Returns:
             tuple: (추출된 전체 텍스트, 상세 결과 리스트)
         """
-        if not os.path.exists(img_path):
-            print(f"이미지 파일을 찾을 수 없습니다: {img_path}")
-            return None, None
-        
-        print(f"이미지에서 텍스트를 추출하는 중: {img_path}")
+        if isinstance(img, np.ndarray):
+            print(f"이미지 배열에서 텍스트를 추출하는 중: {img.shape}")
+        else:
+            if not os.path.exists(img):
+                print(f"이미지 파일을 찾을 수 없습니다: {img}")
+                return None, None
+            
+            print(f"이미지에서 텍스트를 추출하는 중: {img}")
         
         try:
-            # OCR 실행 (새 API 사용)
-            result = self.ocr_model.predict(img_path)
+            # OCR 실행 (새 API 사용, 경로와 배열 모두 지원)
+            result = self.ocr_model.predict(img)
             
             # PaddleOCR 결과 구조 확인
             print(f"PaddleOCR 결과 타입: {type(result)}")
@@ -85,9 +135,10 @@ class OCRModule:
                                         else:
                                             print(f"  [{i+1}] 낮은 신뢰도로 건너뜀: '{text}' ({confidence:.2%})")
                             
-                            # 전체 텍스트 결합
+                            # 전체 텍스트 결합 (위→아래, 왼쪽→오른쪽 읽기 순서)
                             if extracted_texts:
-                                combined_text = " ".join(extracted_texts)
+                                detailed_results.sort(key=self._reading_order_key)
+                                combined_text = " ".join(r['text'] for r in detailed_results)
                                 print(f"추출된 전체 텍스트: {combined_text}")
                                 return combined_text, detailed_results
                             else:
@@ -109,38 +160,52 @@ class OCRModule:
             traceback.print_exc()
             return None, None
     
+    def _reading_order_key(self, result, row_height=20):
+        """바운딩 박스 중심 기준 정렬 키 (약 20px 단위 행, 행 안에서는 x 좌표)"""
+        bbox = np.asarray(result['bbox'], dtype=np.float32).reshape(-1, 2)
+        if bbox.size == 0:
+            return (float('inf'), float('inf'))
+        center_x, center_y = bbox.mean(axis=0)
+        return (round(center_y / row_height), center_x)
+    
     def preprocess_image(self, img_path):
         """
         이미지 전처리 (OCR 성능 향상을 위해)
         
         Args:
-            img_path: 이미지 파일 경로
+            img_path: 이미지 파일 경로 또는 BGR 이미지 배열 (np.ndarray)
             
         Returns:
             전처리된 이미지 또는 None
         """
         try:
-            # 이미지 로드
-            img = cv2.imread(img_path)
+            # 이미지 로드 (이미 디코딩된 배열이면 그대로 사용)
+            img = img_path if isinstance(img_path, np.ndarray) else cv2.imread(img_path)
             if img is None:
                 print(f"이미지를 로드할 수 없습니다: {img_path}")
                 return None
             
+            # OpenCL 사용 가능 시 UMat으로 GPU에서 처리 (OpenCV T-API)
+            src = cv2.UMat(img) if self.use_opencl else img
+            
             # 그레이스케일 변환
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            gray = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY)
             
             # 노이즈 제거
             denoised = cv2.medianBlur(gray, 3)
             
-            # 대비 향상
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-            enhanced = clahe.apply(denoised)
+            # 대비 향상 (더 이상 쓰지 않는 gray 버퍼 재사용)
+            enhanced = self.clahe.apply(denoised, gray)
             
-            # 이진화 (적응적 임계값)
+            # 이진화 (적응적 임계값, denoised 버퍼 재사용)
             binary = cv2.adaptiveThreshold(
-                enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+                enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2,
+                dst=denoised
             )
             
+            if isinstance(binary, cv2.UMat):
+                binary = binary.get()
+            
             return binary
             
         except Exception as e:
@@ -157,36 +222,55 @@ class OCRModule:
         Returns:
             tuple: (추출된 전체 텍스트, 상세 결과 리스트)
         """
-        # 원본 이미지로 먼저 시도
-        text, details = self.extract_text_from_image(img_path)
+        # 이미지는 한 번만 디코딩해 선명도 측정과 OCR에 함께 사용
+        # (로드 실패 시 경로를 그대로 넘겨 기존 오류 처리를 따름)
+        img = cv2.imread(img_path) if os.path.exists(img_path) else None
+        if img is None:
+            img = img_path
+        
+        sharpness = self._measure_sharpness(img)
+        
+        if sharpness is None or sharpness > self.blur_threshold:
+            # 선명한 이미지는 원본으로 먼저 시도
+            text, details = self.extract_text_from_image(img)
+            
+            if text and len(text.strip()) > 0:
+                return text, details
+            
+            print("원본 이미지에서 텍스트 추출 실패, 전처리 후 재시도...")
+            return self._extract_text_preprocessed(img)
+        
+        # 흐린 이미지는 전처리 이미지로 먼저 OCR하고, 실패할 때만 원본으로 재시도
+        print(f"흐린 이미지 감지 (선명도: {sharpness:.1f}), 전처리 후 OCR...")
+        text, details = self._extract_text_preprocessed(img)
         
         if text and len(text.strip()) > 0:
             return text, details
         
-        print("원본 이미지에서 텍스트 추출 실패, 전처리 후 재시도...")
-        
-        # 전처리된 이미지로 재시도
+        print("전처리 이미지에서 텍스트 추출 실패, 원본으로 재시도...")
+        return self.extract_text_from_image(img)
+    
+    def _extract_text_preprocessed(self, img_path):
+        """전처리된 이미지에서 텍스트 추출"""
         preprocessed_img = self.preprocess_image(img_path)
         if preprocessed_img is not None:
             try:
-                # 임시 파일로 저장
-                temp_path = "temp_preprocessed.jpg"
-                cv2.imwrite(temp_path, preprocessed_img)
-                
-                # OCR 재시도
-                text, details = self.extract_text_from_image(temp_path)
-                
-                # 임시 파일 삭제
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-                
-                return text, details
+                # 이진화 이미지를 3채널로 변환해 바로 OCR (임시 파일 없이)
+                bgr_img = cv2.cvtColor(preprocessed_img, cv2.COLOR_GRAY2BGR)
+                return self.extract_text_from_image(bgr_img)
                 
             except Exception as e:
                 print(f"전처리된 이미지 OCR 실패: {e}")
         
         return None, None
     
+    def _measure_sharpness(self, img):
+        """라플라시안 분산으로 이미지 선명도 측정 (BGR 배열이 아니면 None)"""
+        if not isinstance(img, np.ndarray):
+            return None
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return cv2.Laplacian(gray, cv2.CV_64F).var()
+    
     def format_for_llm(self, ocr_text):
         """
         OCR 결과를 LLM에 전달하기 위한 포맷으로 변환
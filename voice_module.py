@@ -4,51 +4,171 @@ Windows 파일 잠금 문제 해결 버전
 """
 
 import pyaudio
-import wave
 import tempfile
 import os
+import io
+import hashlib
 import time
+import threading
 import numpy as np
-from faster_whisper import WhisperModel
-from gtts import gTTS
+from typing import Union
+from functools import cached_property
+from concurrent.futures import ThreadPoolExecutor
 import pygame
-import gc
+
+try:
+    import audioop  # Python 3.13부터 제거됨
+except ImportError:
+    audioop = None
+
+_pcm_rms = None
+if audioop is None:
+    # numba는 import 비용이 크므로 audioop가 없을 때만 사용
+    try:
+        from numba import njit
+        
+        @njit(cache=True, fastmath=True)
+        def _pcm_rms(pcm):
+            """int16 PCM의 RMS (임시 배열 없이 한 번의 루프로 계산)"""
+            total = 0.0
+            for i in range(pcm.size):
+                x = float(pcm[i])
+                total += x * x
+            return np.sqrt(total / pcm.size) if pcm.size else 0.0
+    except ImportError:
+        pass
 
 class VoiceModule:
-    def __init__(self):
-        """음성 모듈 초기화"""
+    # int16 PCM → [-1, 1) float32 변환 배율
+    SCALE = np.float32(1.0 / 32768.0)
+    
+    def __init__(self, model_size="small", device=None, compute_type=None, cpu_threads=0,
+                 piper_model_path=None, tts_cache_size=200):
+        """
+        음성 모듈 초기화
+        
+        Args:
+            model_size: Whisper 모델 크기 ('small', 'medium' 등)
+            device: 'cuda' 또는 'cpu' (None이면 CUDA 사용 가능 여부로 자동 선택)
+            compute_type: 연산 정밀도 (None이면 GPU는 float16, CPU는 int8_float32)
+            cpu_threads: CPU 추론 스레드 수 (0이면 전체 코어 사용)
+            piper_model_path: 로컬 Piper TTS 음성 모델(.onnx) 경로
+                (None이면 PIPER_MODEL_PATH 환경변수, 둘 다 없으면 gTTS 사용)
+            tts_cache_size: 디스크에 캐시할 합성 음성 최대 개수
+        """
         print("🎤 음성 모듈을 초기화하는 중...")
         
-        # Whisper 모델 로드
-        print("  📥 Whisper 모델 로드 중...")
-        self.whisper_model = WhisperModel("medium", device="cpu", compute_type="int8")
+        # Whisper 모델 설정 (모델은 처음 사용할 때 로드)
+        self._whisper_config = dict(
+            model_size=model_size,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads
+        )
+        self._whisper_lock = threading.Lock()
         
-        # 오디오 설정
-        self.CHUNK = 1024
+        # 오디오 설정 (읽기 단위 4096 샘플 = 256ms)
+        self.CHUNK = 4096
         self.FORMAT = pyaudio.paInt16
         self.CHANNELS = 1
         self.RATE = 16000
         
-        # PyAudio 초기화
+        # 녹음 중 첫 청크에서 JIT 컴파일로 멈추지 않도록 미리 컴파일
+        if _pcm_rms:
+            _pcm_rms(np.zeros(self.CHUNK, dtype=np.int16))
+        
+        # PyAudio 초기화 (녹음 스트림은 첫 listen()에서 열고 재사용)
         self.audio = pyaudio.PyAudio()
+        self._stream = None
         
-        # Pygame 초기화 (TTS 재생용)
-        pygame.mixer.init()
+        # Pygame 초기화 (TTS 재생용, 장치는 한 번만 열고 계속 사용)
+        pygame.mixer.init(frequency=22050)
         
-        # 임시 파일 추적
-        self.temp_files = []
+        # 로컬 TTS (Piper) 로드 - 실패하면 gTTS 사용
+        piper_model_path = piper_model_path or os.getenv("PIPER_MODEL_PATH")
+        self.piper_voice = self._load_piper(piper_model_path)
+        
+        # 합성 음성 디스크 캐시 (반복되는 안내 문구는 다시 합성하지 않음)
+        self._tts_engine = f"piper:{os.path.basename(piper_model_path)}" if self.piper_voice else "gtts"
+        self._tts_cache_dir = os.path.join(tempfile.gettempdir(), "vm_tts_cache")
+        self._tts_cache_size = tts_cache_size
+        os.makedirs(self._tts_cache_dir, exist_ok=True)
+        
+        # 비동기 음성 출력 (합성은 병렬, 재생은 순서대로)
+        self._synth_pool = ThreadPoolExecutor(max_workers=2)
+        self._play_pool = ThreadPoolExecutor(max_workers=1)
+        
+        # 미리 합성 중인 음성 ((text, speed_mode) → Future)
+        self._prefetch = {}
+        self._prefetch_lock = threading.Lock()
+        
+        # Whisper 모델 로드 + 워밍업은 백그라운드에서 진행 (TTS는 바로 사용 가능)
+        threading.Thread(target=self._preload_whisper, daemon=True).start()
         
         print("✅ 음성 모듈 준비 완료!")
     
-    def _cleanup_temp_files(self):
-        """임시 파일 정리"""
-        for filepath in self.temp_files[:]:
+    @cached_property
+    def whisper_model(self):
+        """Whisper 모델 (처음 접근할 때 로드 및 워밍업)"""
+        with self._whisper_lock:
+            # 백그라운드 로드와 동시에 접근한 경우 이미 로드된 모델 사용
+            if 'whisper_model' in self.__dict__:
+                return self.__dict__['whisper_model']
+            
+            import ctranslate2
+            from faster_whisper import WhisperModel
+            
+            # 실행 장치 및 정밀도 선택
+            config = self._whisper_config
+            device = config['device']
+            compute_type = config['compute_type']
+            if device is None:
+                device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+            if compute_type is None:
+                compute_type = "float16" if device == "cuda" else "int8_float32"
+            
+            print(f"  📥 Whisper 모델 로드 중... ({config['model_size']}, {device}, {compute_type})")
+            model = WhisperModel(
+                config['model_size'],
+                device=device,
+                compute_type=compute_type,
+                cpu_threads=config['cpu_threads'] or os.cpu_count(),
+                num_workers=1
+            )
+            
+            # 첫 발화 지연을 줄이기 위해 1초 무음으로 미리 추론 (워밍업)
+            # (VAD를 끄고 segments를 끝까지 소비해야 인코더/디코더가 실제로 실행됨)
             try:
-                if os.path.exists(filepath):
-                    os.unlink(filepath)
-                self.temp_files.remove(filepath)
-            except:
-                pass  # 삭제 실패해도 무시
+                warm = np.zeros(self.RATE, dtype=np.float32)
+                list(model.transcribe(warm, language="ko", beam_size=1, vad_filter=False)[0])
+            except Exception as e:
+                print(f"  ⚠️ Whisper 워밍업 실패 (무시): {e}")
+            
+            # 잠금을 풀기 전에 저장해 다른 스레드가 중복 로드하지 않도록 함
+            self.__dict__['whisper_model'] = model
+            return model
+    
+    def _preload_whisper(self):
+        """백그라운드에서 Whisper 모델 미리 로드"""
+        try:
+            self.whisper_model
+        except Exception as e:
+            print(f"  ⚠️ Whisper 모델 로드 실패 (첫 음성 인식 때 다시 시도): {e}")
+    
+    def _load_piper(self, model_path):
+        """Piper 음성 모델 로드 (없거나 실패 시 None)"""
+        if not model_path:
+            return None
+        
+        try:
+            from piper import PiperVoice
+            
+            voice = PiperVoice.load(model_path)
+            print(f"  🗣️ 로컬 TTS(Piper) 사용: {os.path.basename(model_path)}")
+            return voice
+        except Exception as e:
+            print(f"  ⚠️ Piper 로드 실패, gTTS를 사용합니다: {e}")
+            return None
     
     def speak(self, text, speed_mode='normal'):
         """
@@ -63,137 +183,335 @@ class VoiceModule:
         
         print(f"🔊 음성 출력 ({speed_mode}): '{text[:50]}...'")
         
-        temp_file = None
+        # 미리 합성 중이면 그 결과를 기다려 사용
+        synthesis = self._take_prefetch(text, speed_mode)
+        clip = synthesis.result() if synthesis else self._synthesize(text, speed_mode)
+        self._play(clip, speed_mode)
+    
+    def speak_async(self, text, speed_mode='normal', cache=True):
+        """
+        음성 합성은 바로 시작하고, 재생은 앞선 음성이 끝난 뒤 순서대로 진행
+        
+        Args:
+            text: 음성으로 변환할 텍스트
+            speed_mode: 'slow', 'normal', 'fast' 중 선택
+            cache: 합성 결과를 디스크 캐시에 저장할지 여부
+                (반복되는 안내 문구만 True, LLM 답변처럼 일회성 문장은 False)
+            
+        Returns:
+            재생 완료 시 끝나는 Future
+        """
+        if not text or not text.strip():
+            return self._play_pool.submit(lambda: None)
+        
+        print(f"🔊 음성 출력 예약 ({speed_mode}): '{text[:50]}...'")
+        
+        synthesis = (self._take_prefetch(text, speed_mode)
+                     or self._synth_pool.submit(self._synthesize, text, speed_mode, cache))
+        return self._play_pool.submit(
+            lambda: self._play(synthesis.result(), speed_mode)
+        )
+    
+    def stop(self):
+        """
+        예약된 음성 합성/재생을 모두 취소하고 재생 중인 음성을 멈춤
+        (진행 중인 합성 하나만 끝나면 스레드가 종료되므로 프로그램 종료를 막지 않음)
+        """
+        with self._prefetch_lock:
+            for synthesis in self._prefetch.values():
+                synthesis.cancel()
+            self._prefetch.clear()
+        
+        self._synth_pool.shutdown(wait=False, cancel_futures=True)
+        self._play_pool.shutdown(wait=False, cancel_futures=True)
+        
         try:
-            # 속도 모드에 따른 설정
-            if speed_mode == 'slow':
-                # 방법 1: gTTS의 slow 옵션 사용
-                tts = gTTS(text=text, lang='ko', slow=True)
+            pygame.mixer.stop()
+            pygame.mixer.music.stop()
+        except pygame.error:
+            pass
+        
+        # 이후 speak_async()를 위해 새 풀 준비
+        self._synth_pool = ThreadPoolExecutor(max_workers=2)
+        self._play_pool = ThreadPoolExecutor(max_workers=1)
+    
+    def prefetch(self, text, speed_mode='normal'):
+        """
+        곧 말할 문장을 백그라운드에서 미리 합성 (다른 음성 재생/작업과 겹쳐서 진행)
+        
+        Args:
+            text: 음성으로 변환할 텍스트
+            speed_mode: 'slow', 'normal', 'fast' 중 선택
+        """
+        if not text or not text.strip():
+            return
+        
+        key = (text, speed_mode)
+        with self._prefetch_lock:
+            if key not in self._prefetch:
+                self._prefetch[key] = self._synth_pool.submit(self._synthesize, text, speed_mode)
+    
+    def _take_prefetch(self, text, speed_mode):
+        """미리 합성 중인 Future를 꺼내 반환 (없으면 None)"""
+        with self._prefetch_lock:
+            return self._prefetch.pop((text, speed_mode), None)
+    
+    def _synthesize(self, text, speed_mode, cache=True):
+        """
+        음성 합성 (Piper가 있으면 로컬 합성, 없으면 gTTS)
+        이미 합성한 문장은 디스크 캐시에서 바로 불러옴
+        
+        Args:
+            cache: False이면 디스크 캐시를 쓰지 않고 메모리에서만 합성
+        
+        Returns:
+            pygame Sound, 캐시된 mp3 파일 경로 또는 mp3 바이트 (실패 시 None)
+        """
+        if not cache:
+            try:
+                if self.piper_voice:
+                    pcm = self._synthesize_piper(text, speed_mode)
+                    return self._pcm_to_sound(pcm, self.piper_voice.config.sample_rate)
                 
-            elif speed_mode == 'fast':
-                # 빠른 재생을 위한 설정
-                tts = gTTS(text=text, lang='ko', slow=False)
+                from gtts import gTTS
                 
-            else:  # normal
-                tts = gTTS(text=text, lang='ko', slow=False)
+                mp3 = io.BytesIO()
+                gTTS(text=text, lang='ko', slow=(speed_mode == 'slow')).write_to_fp(mp3)
+                return mp3.getvalue()
+                
+            except Exception as e:
+                print(f"❌ TTS 오류: {e}")
+                return None
+        
+        path = self._tts_cache_path(text, speed_mode)
+        
+        try:
+            if os.path.exists(path):
+                # 캐시 적중: 사용 시각 갱신 (LRU 정리 기준)
+                os.utime(path)
+                if self.piper_voice:
+                    with open(path, 'rb') as f:
+                        return self._pcm_to_sound(f.read(), self.piper_voice.config.sample_rate)
+                return path
             
-            # 임시 파일 생성
-            with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp:
-                temp_file = tmp.name
-                self.temp_files.append(temp_file)
+            if self.piper_voice:
+                pcm = self._synthesize_piper(text, speed_mode)
+                self._save_to_cache(path, lambda fp: fp.write(pcm))
+                return self._pcm_to_sound(pcm, self.piper_voice.config.sample_rate)
             
-            # TTS 저장
-            tts.save(temp_file)
+            # gTTS (slow는 gTTS slow 옵션, fast는 재생 시 배속 처리)
+            from gtts import gTTS
             
-            # 속도별 재생 설정
-            if speed_mode == 'fast':
-                # 1.25배속 재생
-                pygame.mixer.quit()
-                pygame.mixer.init(frequency=27562)  # 22050 * 1.25
-            elif speed_mode == 'slow':
-                # 이미 gTTS slow 옵션 적용됨
-                pygame.mixer.quit()
-                pygame.mixer.init(frequency=22050)
-            else:
-                # 일반 속도
-                pygame.mixer.quit()
-                pygame.mixer.init(frequency=22050)
+            tts = gTTS(text=text, lang='ko', slow=(speed_mode == 'slow'))
+            self._save_to_cache(path, tts.write_to_fp)
+            return path
             
-            # 재생
-            pygame.mixer.music.load(temp_file)
-            pygame.mixer.music.play()
+        except Exception as e:
+            print(f"❌ TTS 오류: {e}")
+            return None
+    
+    def _synthesize_piper(self, text, speed_mode):
+        """Piper로 로컬 음성 합성 후 모노 int16 PCM 반환"""
+        from piper import SynthesisConfig
+        
+        # 속도는 Piper의 length_scale로 조절 (작을수록 빠름)
+        length_scale = {'slow': 1.25, 'fast': 0.8}.get(speed_mode, 1.0)
+        chunks = self.piper_voice.synthesize(
+            text, syn_config=SynthesisConfig(length_scale=length_scale)
+        )
+        return b''.join(chunk.audio_int16_bytes for chunk in chunks)
+    
+    def _tts_cache_path(self, text, speed_mode):
+        """문장/속도/언어/엔진으로 만든 캐시 파일 경로"""
+        key = hashlib.sha1(f"{text}|{speed_mode}|ko|{self._tts_engine}".encode()).hexdigest()
+        ext = ".pcm" if self.piper_voice else ".mp3"
+        return os.path.join(self._tts_cache_dir, key + ext)
+    
+    def _save_to_cache(self, path, write):
+        """임시 파일에 쓴 뒤 교체해 캐시에 저장 (동시 합성 시에도 깨진 파일 없음)"""
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self._tts_cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                write(fp)
+            os.replace(tmp_path, path)
+        except:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        
+        self._evict_tts_cache()
+    
+    def _evict_tts_cache(self):
+        """캐시가 최대 개수를 넘으면 가장 오래 사용하지 않은 파일부터 삭제"""
+        try:
+            paths = [
+                os.path.join(self._tts_cache_dir, name)
+                for name in os.listdir(self._tts_cache_dir)
+                if not name.endswith(".tmp")
+            ]
+            if len(paths) <= self._tts_cache_size:
+                return
             
-            # 재생 완료 대기
-            while pygame.mixer.music.get_busy():
-                time.sleep(0.1)
+            paths.sort(key=os.path.getatime)
+            for path in paths[:len(paths) - self._tts_cache_size]:
+                os.unlink(path)
+        except OSError:
+            pass  # 정리 실패해도 무시
+    
+    def _pcm_to_sound(self, pcm, sample_rate):
+        """모노 int16 PCM을 믹서 형식(샘플레이트/채널)에 맞춘 pygame Sound로 변환"""
+        mixer_rate, _, mixer_channels = pygame.mixer.get_init()
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        
+        if sample_rate != mixer_rate and samples.size:
+            positions = np.arange(0, samples.size, sample_rate / mixer_rate)
+            samples = np.interp(positions, np.arange(samples.size), samples).astype(np.int16)
+        
+        if mixer_channels > 1:
+            samples = np.repeat(samples[:, None], mixer_channels, axis=1)
+        
+        return pygame.sndarray.make_sound(np.ascontiguousarray(samples))
+    
+    def _play(self, clip, speed_mode):
+        """합성된 음성(Sound, 캐시된 mp3 파일 또는 mp3 바이트) 재생"""
+        if clip is None:
+            return
+        
+        if isinstance(clip, pygame.mixer.Sound):
+            # Piper 합성 결과는 속도가 이미 반영되어 있으므로 그대로 재생
+            self._play_sound(clip)
+            return
+        
+        temp_file = None
+        
+        def file_path():
+            """메모리 mp3를 지원하지 않는 환경용 파일 경로 (캐시 파일이 없으면 임시 파일 생성)"""
+            nonlocal temp_file
+            if isinstance(clip, str):
+                return clip
+            with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp:
+                tmp.write(clip)
+                temp_file = tmp.name
+            return temp_file
+        
+        try:
+            # 캐시 파일은 메모리로 읽어 재생 (재생 중 파일이 잠기지 않아 캐시 정리와 충돌 없음)
+            if isinstance(clip, bytes):
+                mp3 = io.BytesIO(clip)
+            else:
+                with open(clip, 'rb') as f:
+                    mp3 = io.BytesIO(f.read())
             
-            # 리소스 해제
-            pygame.mixer.music.unload()
-            time.sleep(0.5)
+            if speed_mode == 'fast':
+                # 1.25배속 재생 (믹서를 다시 열지 않고 디코딩된 샘플을 리샘플링)
+                try:
+                    sound = pygame.mixer.Sound(file=mp3)
+                except pygame.error:
+                    sound = pygame.mixer.Sound(file_path())  # 메모리 mp3를 지원하지 않는 환경
+                self._play_sound(self._change_speed(sound, 1.25))
+            else:
+                # 일반 속도 (slow는 이미 gTTS slow 옵션 적용됨)
+                try:
+                    pygame.mixer.music.load(mp3, "mp3")
+                except pygame.error:
+                    pygame.mixer.music.load(file_path())  # 메모리 mp3를 지원하지 않는 환경
+                pygame.mixer.music.play()
+                
+                # 재생 완료 대기
+                while pygame.mixer.music.get_busy():
+                    time.sleep(0.1)
+                
+                # 리소스 해제
+                pygame.mixer.music.unload()
             
         except Exception as e:
             print(f"❌ TTS 오류: {e}")
         finally:
-            # 파일 삭제 시도
             if temp_file:
                 try:
-                    if os.path.exists(temp_file):
-                        os.unlink(temp_file)
-                    if temp_file in self.temp_files:
-                        self.temp_files.remove(temp_file)
-                except:
+                    os.unlink(temp_file)
+                except OSError:
                     pass
     
-    def listen(self, duration=10):
+    def _play_sound(self, sound):
+        """pygame Sound 재생 후 완료까지 대기"""
+        channel = sound.play()
+        while channel is not None and channel.get_busy():
+            time.sleep(0.1)
+    
+    def _change_speed(self, sound, rate):
+        """샘플을 rate배 간격으로 추출해 재생 속도 변경 (믹서 재초기화 없음)"""
+        samples = pygame.sndarray.array(sound)
+        indices = np.arange(0, len(samples), rate).astype(np.intp)
+        return pygame.sndarray.make_sound(np.ascontiguousarray(samples[indices]))
+    
+    def listen(self, duration=10, silence_timeout=1.0, volume_threshold=500):
         """
         마이크에서 음성을 듣고 텍스트로 변환
         
         Args:
-            duration: 녹음 시간 (초)
+            duration: 최대 녹음 시간 (초)
+            silence_timeout: 말이 끝난 뒤 이 시간(초)만큼 조용하면 녹음 종료
+            volume_threshold: 음성으로 판단할 최소 볼륨 (RMS)
             
         Returns:
             인식된 텍스트
         """
         print(f"🎤 {duration}초간 음성을 듣고 있습니다... 말씀해주세요!")
         
-        stream = None
-        temp_file = None
-        
         try:
-            # 녹음 스트림 열기
-            stream = self.audio.open(
-                format=self.FORMAT,
-                channels=self.CHANNELS,
-                rate=self.RATE,
-                input=True,
-                frames_per_buffer=self.CHUNK
-            )
+            # 녹음 스트림 시작 (스트림은 한 번만 열고 재사용)
+            stream = self._ensure_stream()
+            stream.start_stream()
+            
+            # 녹음 버퍼를 한 번에 할당하고 memoryview로 바로 기록 (리스트 + join 없음)
+            buf = bytearray(int(duration * self.RATE) * 2)
+            mv = memoryview(buf)
+            offset = 0
             
-            frames = []
-            start_time = time.time()
+            # 말이 시작된 뒤 이어지는 무음 청크 수 (에너지 기반 VAD)
+            speech_started = False
+            silence_chunks = 0
+            max_silence_chunks = silence_timeout * self.RATE / self.CHUNK
             
-            # 녹음
-            while time.time() - start_time < duration:
-                remaining = duration - int(time.time() - start_time)
+            # 녹음 (버퍼가 차거나, 읽기 오류가 계속되더라도 duration초가 지나면 종료)
+            start_time = time.monotonic()
+            while offset < len(buf) and time.monotonic() - start_time < duration:
+                remaining = int(duration - offset / (self.RATE * 2))
                 print(f"\r⏱️ 남은 시간: {remaining}초  ", end="", flush=True)
                 
                 try:
                     data = stream.read(self.CHUNK, exception_on_overflow=False)
-                    frames.append(data)
+                    n = min(len(data), len(buf) - offset)
+                    mv[offset:offset + n] = data[:n]
+                    offset += n
                     
                     # 볼륨 체크
-                    audio_data = np.frombuffer(data, dtype=np.int16)
-                    volume = np.abs(audio_data).mean()
-                    if volume > 500:
+                    if self._chunk_volume(data) > volume_threshold:
                         print("🔊", end="", flush=True)
+                        speech_started = True
+                        silence_chunks = 0
+                    elif speech_started:
+                        silence_chunks += 1
                 except:
                     continue
+                
+                # 말이 끝난 뒤 충분히 조용하면 조기 종료
+                if silence_chunks > max_silence_chunks:
+                    break
             
             print(f"\n✅ 녹음 완료!")
             
-            # 스트림 정리
-            if stream:
-                stream.stop_stream()
-                stream.close()
-                stream = None
+            # 스트림 일시 정지 (닫지 않음)
+            stream.stop_stream()
             
-            # 오디오 데이터를 파일로 저장
-            audio_data = b''.join(frames)
-            
-            # 임시 파일 생성
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                temp_file = tmp.name
-                self.temp_files.append(temp_file)
-            
-            # WAV 파일 작성
-            with wave.open(temp_file, 'wb') as wf:
-                wf.setnchannels(self.CHANNELS)
-                wf.setsampwidth(self.audio.get_sample_size(self.FORMAT))
-                wf.setframerate(self.RATE)
-                wf.writeframes(audio_data)
-            
-            # STT 처리
-            text = self._speech_to_text(temp_file)
+            # 16kHz 모노 int16 → float32 배열로 변환해 바로 STT 처리 (임시 WAV 파일 없음)
+            # (중간 배열 없이 한 번의 곱셈으로 float32 결과만 할당)
+            pcm = np.frombuffer(mv[:offset], dtype=np.int16)
+            audio = np.multiply(pcm, self.SCALE, dtype=np.float32)
+            text = self._speech_to_text(audio)
             
             return text
             
@@ -204,49 +522,64 @@ class VoiceModule:
             print(f"\n❌ 녹음 오류: {e}")
             return None
         finally:
-            # 스트림 정리
-            if stream:
+            # 스트림 일시 정지 (닫지 않음)
+            if self._stream:
                 try:
-                    stream.stop_stream()
-                    stream.close()
+                    if self._stream.is_active():
+                        self._stream.stop_stream()
                 except:
                     pass
-            
-            # 파일 삭제 시도
-            if temp_file:
-                try:
-                    time.sleep(0.5)  # Windows 파일 시스템 대기
-                    if os.path.exists(temp_file):
-                        os.unlink(temp_file)
-                    if temp_file in self.temp_files:
-                        self.temp_files.remove(temp_file)
-                except:
-                    pass  # 삭제 실패해도 계속 진행
     
-    def _speech_to_text(self, audio_file_path):
+    def _ensure_stream(self):
+        """녹음 스트림을 처음 한 번만 정지 상태로 열어 두고 재사용"""
+        if self._stream is None:
+            self._stream = self.audio.open(
+                format=self.FORMAT,
+                channels=self.CHANNELS,
+                rate=self.RATE,
+                input=True,
+                frames_per_buffer=self.CHUNK,
+                start=False
+            )
+        return self._stream
+    
+    def _chunk_volume(self, data):
+        """int16 오디오 청크의 RMS 볼륨 (audioop, 없으면 numba, 둘 다 없으면 numpy로 계산)"""
+        if audioop:
+            return audioop.rms(data, 2)
+        if _pcm_rms:
+            return _pcm_rms(np.frombuffer(data, dtype=np.int16))
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        return float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+    
+    def _speech_to_text(self, audio: Union[str, np.ndarray]):
         """
-        음성 파일을 텍스트로 변환
+        음성을 텍스트로 변환
         
         Args:
-            audio_file_path: 오디오 파일 경로
+            audio: 오디오 파일 경로 또는 16kHz 모노 float32 배열
             
         Returns:
             인식된 텍스트
         """
-        if not os.path.exists(audio_file_path):
+        if isinstance(audio, str) and not os.path.exists(audio):
             print("❌ 오디오 파일을 찾을 수 없습니다.")
             return None
         
         print("🔄 음성을 텍스트로 변환하는 중...")
         
         try:
-            # Whisper로 변환
+            # Whisper로 변환 (짧은 대화형 발화이므로 greedy 디코딩 + 무음 구간 건너뛰기)
             segments, info = self.whisper_model.transcribe(
-                audio_file_path,
+                audio,
                 language="ko",
-                beam_size=5,
-                best_of=5,
-                temperature=0.0
+                beam_size=1,
+                best_of=1,
+                temperature=0.0,
+                vad_filter=True,
+                vad_parameters=dict(min_silence_duration_ms=500),
+                condition_on_previous_text=False,
+                without_timestamps=True
             )
             
             # 결과 텍스트 조합
@@ -269,8 +602,12 @@ class VoiceModule:
     
     def __del__(self):
         """정리 작업"""
-        # 남은 임시 파일 모두 삭제
-        self._cleanup_temp_files()
+        # 녹음 스트림 정리
+        if getattr(self, '_stream', None):
+            try:
+                self._stream.close()
+            except:
+                pass
         
         # PyAudio 정리
         if hasattr(self, 'audio'):